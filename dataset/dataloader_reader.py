@@ -38,7 +38,8 @@ def load_dataloader(index,
         pipeline=xception_tf_pipeline,
         full_dataset = False,
         dataset_name = "SKILL",
-        root_path = "/lab/tmpig15b/u/"):
+        root_path = "/lab/tmpig15b/u/",
+        num_workers = 0):
 
     current_path = os.path.dirname(os.path.abspath(__file__))
     if dataset_name == "SKILL":
@@ -54,21 +55,21 @@ def load_dataloader(index,
                 test_dataset = CollectionDataset(task_name, 'test', input_type=input_type, vector_type=vector_type, pipeline=pipeline, label_dict=train_dataset.label_dict, full_dataset=full_dataset, root_path=root_path)
                 train_datasets.append(train_dataset)
                 test_datasets.append(test_dataset)
-            train_loaders = [DataLoader(td, batch_size=batch_size, shuffle=shuffle_train) for td in train_datasets]
+            train_loaders = [td.build_loader(batch_size, shuffle=shuffle_train, num_workers=num_workers) for td in train_datasets]
             test_batch_size = batch_size//2
             if test_batch_size == 0:
                 test_batch_size = 1
-            test_loaders = [DataLoader(td, batch_size=test_batch_size, shuffle=shuffle_test) for td in test_datasets]
-            return train_datasets, test_datasets, train_loaders, test_loaders 
+            test_loaders = [td.build_loader(test_batch_size, shuffle=shuffle_test, num_workers=num_workers) for td in test_datasets]
+            return train_datasets, test_datasets, train_loaders, test_loaders
         else:
             train_dataset =  CollectionDataset(task_name_list[index], 'train', input_type=input_type, vector_type=vector_type, pipeline=pipeline, full_dataset=full_dataset, root_path=root_path)
             test_dataset = CollectionDataset(task_name_list[index], 'test', input_type=input_type, vector_type=vector_type, pipeline=pipeline, label_dict=train_dataset.label_dict, full_dataset=full_dataset, root_path=root_path)
             
-        train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=shuffle_train)
+        train_loader = train_dataset.build_loader(batch_size, shuffle=shuffle_train, num_workers=num_workers)
         test_batch_size = batch_size//2
         if test_batch_size == 0:
             test_batch_size = 1
-        test_loader = DataLoader(test_dataset, batch_size=test_batch_size, shuffle=shuffle_test)
+        test_loader = test_dataset.build_loader(test_batch_size, shuffle=shuffle_test, num_workers=num_workers)
         return train_dataset, test_dataset, train_loader, test_loader
 
 if __name__ == "__main__":
@@ -1,23 +1,57 @@
 import os
 import sqlite3
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
 from glob import glob
 from typing import Any, Optional
 
 import h5py
+import numpy as np
 import torchvision.transforms as TF
 from PIL import Image
 from torch import Tensor
-from torch.utils.data import Dataset
+from torch.utils.data import DataLoader, Dataset
 from torchvision.transforms import functional
 from torchvision.transforms.functional import InterpolationMode
 from tqdm import tqdm
-import random
 import math
 import pickle
 import torch
 
+# optional libjpeg-turbo decode path; PIL (ideally pillow-simd, a drop-in
+# replacement) remains the fallback and handles the non-JPEG formats
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+
+    _turbo_jpeg = TurboJPEG()
+except Exception:
+    _turbo_jpeg = None
+
+JPEG_EXTENSIONS = ("jpg", "jpeg", "jfif")
+
+# optional numba JIT for the per-class sampling; the NumPy permutation
+# path below is the fallback
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+if njit is not None:
+
+    @njit(cache=True)
+    def _partial_permutation(n_rows, n_keep, seed):
+        """first n_keep entries of a seeded Fisher-Yates permutation;
+        only does n_keep swaps instead of permuting all n_rows"""
+        np.random.seed(seed)
+        idx = np.arange(n_rows)
+        for i in range(n_keep):
+            j = i + np.random.randint(0, n_rows - i)
+            swap = idx[i]
+            idx[i] = idx[j]
+            idx[j] = swap
+        return idx[:n_keep]
+
 VALID_IMAGE_EXTENSIONS = [
     "bmp",
     "gif",
@@ -31,6 +65,64 @@ VALID_IMAGE_EXTENSIONS = [
     "webp",
 ]
 
+# frozenset for O(1) membership tests while cataloging files
+VALID_IMAGE_EXTENSION_SET = frozenset(VALID_IMAGE_EXTENSIONS)
+
+
+
+# verification results cached across runs, keyed by (dataset, set type,
+# full_dataset, kind, source mtime); the full-sweep __main__ re-verifies
+# every split of every dataset otherwise
+#
+# limitation: the "images" key invalidates on the sqlite database's
+# mtime, not the image tree's, so deleting image files without touching
+# the database keeps a stale OK until the cache file is removed
+_VERIFY_CACHE_PATH = os.path.expanduser("~/.cache/collection_verify.pkl")
+
+
+def _load_verify_cache() -> dict:
+    try:
+        with open(_VERIFY_CACHE_PATH, "rb") as file_h:
+            return pickle.load(file_h)
+    except (OSError, pickle.PickleError, EOFError):
+        return {}
+
+
+def _store_verify_ok(key) -> None:
+    cache = _load_verify_cache()
+    cache[key] = True
+    try:
+        os.makedirs(os.path.dirname(_VERIFY_CACHE_PATH), exist_ok=True)
+        with open(_VERIFY_CACHE_PATH, "wb") as file_h:
+            pickle.dump(cache, file_h)
+    except OSError:
+        pass
+
+
+# one persistent connection per database file; re-connecting per query
+# costs far more than the queries themselves
+_DB_CONNECTIONS: dict = {}
+
+
+def _get_database_connection(database_path: str) -> sqlite3.Connection:
+    """open (once) and cache a connection to the database at the path"""
+    connection = _DB_CONNECTIONS.get(database_path)
+    if connection is None:
+        assert os.path.isfile(database_path)
+        connection = sqlite3.connect(database_path, check_same_thread=False)
+        try:
+            # covering index so the per-dataset SELECT is an index seek
+            # instead of a full scan of the images table
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_images_ds_prob_set ON images"
+                "(dataset, problem, set_id, file_hash, relative_path, class_id);"
+            )
+            connection.commit()
+        except sqlite3.OperationalError:
+            # e.g. database is read-only; queries still work without the index
+            pass
+        _DB_CONNECTIONS[database_path] = connection
+    return connection
 
 
 SET_TYPES = ["train", "validation", "test"]
@@ -101,7 +193,7 @@ class CollectionDataset(Dataset):
     ) -> None:
         super().__init__()
         """init function for the dataset"""
-        random.seed(27)
+        self._rng = np.random.default_rng(27)
 
         self.initialized_correctly: bool = False
         self.images_root_path = root_path + "name-pending_collection/"
@@ -124,6 +216,7 @@ class CollectionDataset(Dataset):
         self.input_type = input_type
         self.vector_type = vector_type
         self.pipeline = pipeline
+        self.full_dataset = full_dataset
 
         # get the dataset_name
         # query = f"select dataset_name FROM datasets where dataset={dataset};"
@@ -138,10 +231,12 @@ class CollectionDataset(Dataset):
         print("load relevant results from database...")
         set_type_int = SET_TYPES.index(self.set_type)
         if not verify_all_sets_all_types:
-            query = f'SELECT file_hash, relative_path, class_id, set_id, problem FROM images WHERE dataset="{dataset_name}" AND problem=0 AND set_id={set_type_int};'
+            query = 'SELECT file_hash, relative_path, class_id, set_id, problem FROM images WHERE dataset=? AND problem=0 AND set_id=?;'
+            params = (dataset_name, set_type_int)
         else:
-            query = f'SELECT file_hash, relative_path, class_id, set_id, problem FROM images WHERE dataset="{dataset_name}" AND problem=0;'
-        rows = CollectionDataset.execute_database_query(query, self.database_path)
+            query = 'SELECT file_hash, relative_path, class_id, set_id, problem FROM images WHERE dataset=? AND problem=0;'
+            params = (dataset_name,)
+        rows = CollectionDataset.execute_database_query(query, self.database_path, params)
 
         if len(rows) == 0:
             print(
@@ -149,7 +244,6 @@ class CollectionDataset(Dataset):
             )
             return None
 
-        self.images: list[CollectionImage] = []
         self.dict = {}
         self.label_dict = {}
 
@@ -192,41 +286,54 @@ class CollectionDataset(Dataset):
             self.labels, self.hashes, self.paths, self.id_set, self.problem_list = self._random_value(self.dict, self.sample_test_size)
         else:
             self.labels, self.hashes, self.paths, self.id_set, self.problem_list = self._random_value(self.dict, math.inf)
-        for i in range(len(self.labels)):
-            self.labels[i] = self.label_dict[self.labels[i]]
-            self.images.append(CollectionImage(file_hash=self.hashes[i], 
-                                                relative_path=self.paths[i], 
-                                                class_id=self.labels[i], 
-                                                set_id=int(self.id_set[i]),
-                                                problem=int(self.problem_list[i]),
-                                                ))
-
-        # store the details for the images
-        # for row in rows:
-        #     self.images += [
-        #         CollectionImage(
-        #             file_hash=row[0],
-        #             relative_path=row[1],
-        #             class_id=int(row[2]),
-        #             set_id=int(row[3]),
-        #             problem=int(row[4]),
-        #         )
-        #     ]
+        # remap labels through a lookup table in one vectorized gather
+        # instead of one dict lookup per row
+        label_keys = np.fromiter(self.label_dict.keys(), dtype=np.int64)
+        label_lut = np.full(label_keys.max() + 1, -1, dtype=np.int64)
+        label_lut[label_keys] = np.fromiter(self.label_dict.values(), dtype=np.int64)
+
+        # store the image details as parallel columns (struct-of-arrays)
+        # instead of one dataclass per image
+        self.class_ids = label_lut[np.asarray(self.labels, dtype=np.int64)]
+        self.file_hashes = np.asarray(self.hashes, dtype=object)
+        self.relative_paths = np.asarray(self.paths, dtype=object)
+        self.set_ids = np.asarray(self.id_set, dtype=np.int64)
+        self.problems = np.asarray(self.problem_list, dtype=np.int64)
+        self.feature_matrix: Optional[np.ndarray] = None
+        self._tensor_cache: Optional[np.ndarray] = None
+
+        # absolute paths precomputed once, so __getitem__ does not rebuild
+        # the same strings every sample of every epoch
+        dataset_root = self.root_path + self.dataset_name + "/"
+        self.abs_paths = np.asarray(
+            [dataset_root + p for p in self.relative_paths], dtype=object
+        )
 
         if not verify_all_sets_all_types:
             if self.input_type == "original":
-                self.initialized_correctly = self.verify_original_images_exist()
-            else:  # features input
+                images_key = self._verify_cache_key("images")
+                if _load_verify_cache().get(images_key):
+                    self.initialized_correctly = True
+                else:
+                    self.initialized_correctly = self.verify_original_images_exist()
+                    if self.initialized_correctly:
+                        _store_verify_ok(images_key)
+            else:  # features input (always loads, so nothing to skip)
                 self.initialized_correctly = (
                     self.verify_feature_vectors_exist_and_load()
                 )
         else:
-            # assume true, but set to false if any fail
-            self.initialized_correctly = True
-            if not self.verify_original_images_exist():
-                self.initialized_correctly = False
-            if not self.verify_feature_vectors_exist_and_load(skip_load=True):
-                self.initialized_correctly = False
+            cache = _load_verify_cache()
+            images_key = self._verify_cache_key("images")
+            vectors_key = self._verify_cache_key("vectors")
+            if cache.get(images_key) and cache.get(vectors_key):
+                self.initialized_correctly = True
+            else:
+                # one fused pass instead of two full walks of the samples
+                self.initialized_correctly = self.verify_images_and_vectors_exist()
+                if self.initialized_correctly:
+                    _store_verify_ok(images_key)
+                    _store_verify_ok(vectors_key)
 
         if self.initialized_correctly:
             print("done")
@@ -240,48 +347,86 @@ class CollectionDataset(Dataset):
         set_id = []
         problem_id = []
         if amount == math.inf:
-            num_each_class = math.inf
+            # slicing with None keeps every row of the permutation
+            num_each_class = None
         else:
             num_each_class = round(amount/self.num_classes)
 
+        allowed_labels = set(list(self.label_dict.keys())[:self.num_classes])
         current_class_size = 0
         for key, values in dictionary.items():
-            track_num = 0
-            if key not in list(self.label_dict.keys())[:self.num_classes]:
+            if key not in allowed_labels:
                 assert self.num_classes == self.sample_class_num
                 if self.num_classes == self.sample_class_num:
                     continue
-            random.shuffle(values)
-            for value in values:
-                label.append(key)
-                hash.append(value[0])
-                path.append(value[1])
-                set_id.append(value[2])
-                problem_id.append(value[3])
-                track_num += 1
-                if track_num >= num_each_class:
-                    break
+            # sample the class in one vectorized permutation + fancy index
+            # instead of shuffling and appending row-by-row in Python
+            values_array = np.asarray(values, dtype=object)
+            if num_each_class is None:
+                num_to_keep = len(values_array)
+            else:
+                num_to_keep = min(num_each_class, len(values_array))
+            if njit is not None:
+                idx = _partial_permutation(
+                    len(values_array), num_to_keep, int(self._rng.integers(1 << 31))
+                )
+            else:
+                idx = self._rng.permutation(len(values_array))[:num_to_keep]
+            chosen = values_array[idx]
+            label.append(np.full(len(chosen), key, dtype=np.int64))
+            hash.append(chosen[:, 0])
+            path.append(chosen[:, 1])
+            set_id.append(chosen[:, 2])
+            problem_id.append(chosen[:, 3])
             current_class_size += 1
             if current_class_size >= self.num_classes:
                 break
-        return label, hash, path, set_id, problem_id
+        return (
+            np.concatenate(label),
+            np.concatenate(hash),
+            np.concatenate(path),
+            np.concatenate(set_id),
+            np.concatenate(problem_id),
+        )
 
 
     def __len__(self) -> int:
         assert self.initialized_correctly
 
-        return len(self.images)
+        return len(self.class_ids)
 
     def __getitem__(self, index: int) -> tuple:
         assert self.initialized_correctly
-        assert 0 <= index <= len(self.images)
+        assert 0 <= index <= len(self.class_ids)
 
         if self.input_type == "features":
-            return torch.from_numpy(self.images[index].feature_vector), self.images[index].class_id
+            vector = torch.from_numpy(self.feature_matrix[index])
+            if vector.dtype != torch.float32:
+                # packed matrices store fp16; widen only when consumed
+                vector = vector.float()
+            return vector, int(self.class_ids[index])
         else:
+            if self._tensor_cache is not None:
+                # serve the pre-transformed tensor from the mmap'd cache
+                return (
+                    torch.from_numpy(self._tensor_cache[index].astype(np.float32)),
+                    int(self.class_ids[index]),
+                )
+
+            return self._load_transformed_image(index), int(self.class_ids[index])
 
-            image_filename = self.original_image_path_for_index(index)
+    def _load_transformed_image(self, index: int):
+        """decode the original image and run the transform pipeline"""
+        image_filename = self.original_image_path_for_index(index)
 
+        extension = image_filename.rpartition(".")[2].lower()
+        if _turbo_jpeg is not None and extension in JPEG_EXTENSIONS:
+            # SIMD-accelerated decode straight to RGB
+            with open(image_filename, "rb") as file_h:
+                image = Image.fromarray(
+                    _turbo_jpeg.decode(file_h.read(), pixel_format=TJPF_RGB)
+                )
+        else:
             with Image.open(image_filename) as image:
 
                 # for the original images, make sure to convert to RGB
@@ -291,19 +436,72 @@ class CollectionDataset(Dataset):
                 # convert to a tensor before doing anything else
                 # image_tensor = functional.to_tensor(image)
 
-            # if there is a pipeline, run it
-            if self.pipeline:
-                image_tensor = self.pipeline(image)
+        # if there is a pipeline, run it
+        if self.pipeline:
+            image_tensor = self.pipeline(image)
 
-            return image_tensor, self.images[index].class_id
+        return image_tensor
+
+    def materialize_tensors(self, out_path: str) -> None:
+        """run the (deterministic) decode+transform pipeline once for every
+        image and write the results to a single fp16 .npy; later runs mmap
+        it via load_materialized_tensors instead of re-decoding each epoch"""
+        assert self.initialized_correctly
+
+        first = self._load_transformed_image(0)
+        out = np.lib.format.open_memmap(
+            out_path,
+            mode="w+",
+            dtype=np.float16,
+            shape=(len(self.class_ids), *first.shape),
+        )
+        out[0] = first.numpy()
+        for index in tqdm(range(1, len(self.class_ids))):
+            out[index] = self._load_transformed_image(index).numpy()
+        out.flush()
+
+    def load_materialized_tensors(self, path: str) -> None:
+        """mmap a matrix written by materialize_tensors and serve samples
+        from it in __getitem__"""
+        self._tensor_cache = np.load(path, mmap_mode="r")
+        assert len(self._tensor_cache) == len(self.class_ids)
+
+    def build_loader(
+        self, batch_size: int, shuffle: bool = False, num_workers: int = 8
+    ) -> DataLoader:
+        """build a DataLoader tuned for throughput: pinned host memory for
+        overlap-friendly H2D copies, persistent workers, and prefetching"""
+        loader_kwargs: dict = {
+            "batch_size": batch_size,
+            "shuffle": shuffle,
+            "num_workers": num_workers,
+            "pin_memory": True,
+        }
+        if num_workers > 0:
+            loader_kwargs["persistent_workers"] = True
+            loader_kwargs["prefetch_factor"] = 4
+
+        return DataLoader(self, **loader_kwargs)
 
     def original_image_path_for_index(self, index: int) -> str:
         """get the path to the original image"""
-        assert 0 <= index <= len(self.images)
+        assert 0 <= index <= len(self.class_ids)
+
+        return self.abs_paths[index]
+
+    def _present_relative_paths(self) -> set:
+        """relative paths of all files under the dataset folder, from one
+        directory walk instead of one stat syscall per image"""
+        dataset_root = self.root_path + self.dataset_name + "/"
+        present = set()
+        for dir_path, _, filenames in os.walk(dataset_root):
+            relative_dir = os.path.relpath(dir_path, dataset_root)
+            if relative_dir == ".":
+                present.update(filenames)
+            else:
+                present.update(relative_dir + "/" + name for name in filenames)
 
-        return (
-            self.root_path + self.dataset_name + "/" + self.images[index].relative_path
-        )
+        return present
 
     def verify_original_images_exist(self) -> bool:
         """check that all original image files exist"""
@@ -311,17 +509,113 @@ class CollectionDataset(Dataset):
         had_error = False
         print("verifying that original images exist...")
 
+        present = self._present_relative_paths()
+        dataset_root = self.root_path + self.dataset_name + "/"
+
         # order is not important
-        for index in tqdm(range(len(self.images))):
-            original_filename = self.original_image_path_for_index(index)
-            if not os.path.isfile(original_filename):
-                print("missing", original_filename)
+        for relative_path in self.relative_paths:
+            if relative_path not in present:
+                print("missing", dataset_root + relative_path)
                 had_error = True
 
         return not had_error
 
+    def _feature_vector_keys(self) -> Optional[set]:
+        """set of available feature vector hashes, read from the packed
+        index when present, else from one HDF5 open with an enlarged
+        metadata cache"""
+        if self.vector_type is None:
+            print("error with vector_type")
+            return None
+
+        npy_filename, hash2row_filename = self.packed_feature_paths()
+        if os.path.isfile(npy_filename) and os.path.isfile(hash2row_filename):
+            with open(hash2row_filename, "rb") as index_h:
+                return set(pickle.load(index_h).keys())
+
+        feature_vectors_filename = (
+            self.vectors_root_path + self.vector_type + "/" + self.dataset_name + ".h5"
+        )
+        if not os.path.isfile(feature_vectors_filename):
+            print("feature vector file is missing", feature_vectors_filename)
+            return None
+
+        with h5py.File(feature_vectors_filename, rdcc_nbytes=256 << 20) as file_h:
+            return set(file_h.keys())
+
+    def verify_images_and_vectors_exist(self) -> bool:
+        """check both the original image files and the feature vector keys
+        in a single fused pass over the samples"""
+
+        had_error = False
+        print("verifying that original images and feature vectors exist...")
+
+        present = self._present_relative_paths()
+        dataset_root = self.root_path + self.dataset_name + "/"
+        vector_keys = self._feature_vector_keys()
+        if vector_keys is None:
+            return False
+
+        for index in range(len(self.class_ids)):
+            if self.relative_paths[index] not in present:
+                print("missing", dataset_root + self.relative_paths[index])
+                had_error = True
+            if self.file_hashes[index] not in vector_keys:
+                print("missing feature vector:", self.file_hashes[index])
+                had_error = True
+
+        return not had_error
+
+    def _verify_cache_key(self, kind: str) -> tuple:
+        """cache key for a verification pass; the source mtime invalidates
+        the cached result when the database / vector file changes, and
+        full_dataset is part of the key because a sampled run only
+        verifies the rows it drew"""
+        if kind == "images":
+            source = self.database_path
+        else:
+            if self.vector_type is None:
+                # nothing cacheable; the verify call itself reports the
+                # missing vector_type and fails initialization
+                return (self.dataset_name, self.set_type, self.full_dataset, kind, None)
+            source = (
+                self.vectors_root_path + self.vector_type + "/" + self.dataset_name + ".h5"
+            )
+        try:
+            mtime = os.path.getmtime(source)
+        except OSError:
+            mtime = -1
+
+        return (self.dataset_name, self.set_type, self.full_dataset, kind, mtime)
+
+    def packed_feature_paths(self) -> tuple:
+        """paths of the packed matrix + hash->row index for this dataset"""
+        base = self.vectors_root_path + self.vector_type + "/" + self.dataset_name
+        return base + ".npy", base + ".hash2row.pkl"
+
+    @staticmethod
+    def pack_feature_vectors(
+        h5_filename: str, npy_filename: str, hash2row_filename: str, dtype=np.float16
+    ) -> None:
+        """one-shot migration from the per-hash HDF5 layout to a packed
+        2-D .npy matrix plus a hash->row index, so loading can mmap the
+        matrix instead of walking the HDF5 B-tree per key
+
+        vectors are stored as fp16 by default: halves disk/RAM/bandwidth,
+        and __getitem__ widens back to fp32 at consumption time"""
+        with h5py.File(h5_filename, rdcc_nbytes=512 << 20, rdcc_nslots=1_000_003) as file_h:
+            hashes = list(file_h.keys())
+            first = file_h[hashes[0]]
+            matrix = np.empty((len(hashes), *first.shape), dtype=first.dtype)
+            for i, file_hash in enumerate(hashes):
+                file_h[file_hash].read_direct(matrix[i])
+
+        np.save(npy_filename, matrix.astype(dtype, copy=False))
+        with open(hash2row_filename, "wb") as file_h:
+            pickle.dump({h: i for i, h in enumerate(hashes)}, file_h)
+
     def verify_feature_vectors_exist_and_load(self, skip_load: bool = False) -> bool:
-        """check that the hdf5 file exists, and load all of the feature vectors for the set"""
+        """check that the feature vector file exists, and load all of the feature vectors for the set"""
 
         if self.vector_type is None:
             print("error with vector_type")
@@ -339,16 +633,32 @@ class CollectionDataset(Dataset):
         else:
             print(f"verifying all {self.vector_type} feature vectors exist...")
 
-        if not os.path.isfile(feature_vectors_filename):
-            print("feature vector file is missing", feature_vectors_filename)
-        else:
+        # force order to be the same
+        all_hashes = list(self.file_hashes)
 
-            all_hashes = []
-            # force order to be the same
-            for i in range(len(self.images)):
-                all_hashes += [self.images[i].file_hash]
+        # prefer the packed layout (see pack_feature_vectors): one mmap'd
+        # matrix plus an in-memory index, no HDF5 metadata walk at all
+        npy_filename, hash2row_filename = self.packed_feature_paths()
+        if os.path.isfile(npy_filename) and os.path.isfile(hash2row_filename):
+            with open(hash2row_filename, "rb") as index_h:
+                hash2row = pickle.load(index_h)
 
-            with h5py.File(feature_vectors_filename) as file_h:
+            missing_list = [h for h in all_hashes if h not in hash2row]
+            if len(missing_list) > 0:
+                print("missing these feature vectors:", missing_list)
+            else:
+                if not skip_load:
+                    matrix = np.load(npy_filename, mmap_mode="r")
+                    self.feature_matrix = matrix[[hash2row[h] for h in all_hashes]]
+                had_error = False
+        elif not os.path.isfile(feature_vectors_filename):
+            print("feature vector file is missing", feature_vectors_filename)
+        else:
+            # enlarge the chunk cache; the default 1 MB thrashes badly with
+            # one HDF5 dataset per hash
+            with h5py.File(
+                feature_vectors_filename, rdcc_nbytes=512 << 20, rdcc_nslots=1_000_003
+            ) as file_h:
                 # check that all hashes exist in file
                 feature_vectors_hashes = list(file_h.keys())
                 missing_list = list(set(all_hashes) - set(feature_vectors_hashes))
@@ -358,39 +668,90 @@ class CollectionDataset(Dataset):
                 else:
                     # if no issues, create matrix of feature vectors
                     if not skip_load:
-                        for i, _ in enumerate(self.images):
-                            self.images[i].feature_vector = file_h[self.images[i].file_hash][:]  # type: ignore
+                        # read everything into one contiguous matrix with
+                        # read_direct instead of a high-level h5py lookup
+                        # (and a fresh ndarray) per image
+                        first = file_h[all_hashes[0]]
+                        self.feature_matrix = np.empty(
+                            (len(all_hashes), *first.shape), dtype=first.dtype
+                        )
+                        # issue the reads concurrently, in on-disk offset
+                        # order, so scattered per-key reads become
+                        # near-sequential and the latency (NFS) is hidden
+                        datasets = [file_h[file_hash] for file_hash in all_hashes]
+                        read_order = sorted(
+                            range(len(datasets)),
+                            key=lambda i: datasets[i].id.get_offset() or 0,
+                        )
+
+                        def _read_row(i):
+                            datasets[i].read_direct(self.feature_matrix[i])
+
+                        with ThreadPoolExecutor(max_workers=16) as pool:
+                            list(pool.map(_read_row, read_order, chunksize=64))
+
+                        # move the matrix into shared memory so forked
+                        # DataLoader workers get zero-copy views instead of
+                        # a private replica each (the packed .npy path is
+                        # already shared through the page cache via mmap)
+                        self.feature_matrix = (
+                            torch.from_numpy(self.feature_matrix).share_memory_().numpy()
+                        )
                     had_error = False
 
         return not had_error
 
     def get_entry_for_index(self, index: int) -> CollectionImage:
-        """get the entry for a given index"""
+        """build the entry for a given index from the columns"""
         assert self.initialized_correctly
-        assert 0 <= index <= len(self.images)
+        assert 0 <= index <= len(self.class_ids)
+
+        entry = CollectionImage(
+            file_hash=self.file_hashes[index],
+            relative_path=self.relative_paths[index],
+            class_id=int(self.class_ids[index]),
+            set_id=int(self.set_ids[index]),
+            problem=int(self.problems[index]),
+        )
+        if self.feature_matrix is not None:
+            entry.feature_vector = self.feature_matrix[index]
 
-        return self.images[index]
+        return entry
 
     @property
     def unique_class_id_list(self) -> list:
         """get a list of unique class_id"""
-        assert len(self.images) > 0
+        assert len(self.class_ids) > 0
 
-        all_class_ids = [x.class_id for x in self.images]
-        # return an ordered and unique list
-        return sorted(list(set(all_class_ids)))
+        # np.unique already returns an ordered and unique array
+        return np.unique(self.class_ids).tolist()
 
     @property
     def class_id_counts(self) -> dict:
         """get the counts for all class_ids"""
-        assert len(self.images) > 0
+        assert len(self.class_ids) > 0
 
-        counts = {}
-        all_class_ids = [x.class_id for x in self.images]
-        for class_id in self.unique_class_id_list:
-            counts.update({class_id: all_class_ids.count(class_id)})
+        # one O(N) pass instead of one list.count scan per class
+        unique_ids, counts = np.unique(self.class_ids, return_counts=True)
 
-        return counts
+        return dict(zip(unique_ids.tolist(), counts.tolist()))
+
+    @staticmethod
+    def list_image_files(root_path: str) -> list:
+        """recursively collect image files under root_path, filtering by
+        extension on the dirent instead of recursive glob + per-file
+        string splitting"""
+        found = []
+        pending = [root_path]
+        while pending:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.name.rpartition(".")[2].lower() in VALID_IMAGE_EXTENSION_SET:
+                        found.append(entry.path)
+
+        return found
 
     @staticmethod
     def test_if_valid_image(full_file_path: str) -> bool:
@@ -408,6 +769,23 @@ class CollectionDataset(Dataset):
             # failed in trying to open the image file
             return False
 
+    @staticmethod
+    def test_if_valid_images_parallel(full_file_paths: list, max_workers: Optional[int] = None) -> list:
+        """run test_if_valid_image across a process pool; image
+        verification is embarrassingly parallel and decode-bound"""
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+            # chunksize amortizes the per-task IPC overhead
+            return list(
+                tqdm(
+                    pool.map(
+                        CollectionDataset.test_if_valid_image,
+                        full_file_paths,
+                        chunksize=64,
+                    ),
+                    total=len(full_file_paths),
+                )
+            )
+
     @staticmethod
     def sanitize_and_check_root_path(root_path: str) -> str:
         """make sure root path ends in '/', and that it exists"""
@@ -417,18 +795,12 @@ class CollectionDataset(Dataset):
         return root_path
 
     @staticmethod
-    def execute_database_query(query: str, database_path) -> list:
-        """execute a query on the database at the path"""
-
-        # root_path = CollectionDataset.sanitize_and_check_root_path(root_path)
-        database_filename = database_path  # root_path + "database.sqlite"
-
-        assert os.path.isfile(database_filename)
+    def execute_database_query(query: str, database_path, params: tuple = ()) -> list:
+        """execute a (parameterized) query on the database at the path"""
 
-        with sqlite3.connect(database_filename) as sql_conn:
-            cursor = sql_conn.cursor()
-            cursor.execute(query)
-            rows = cursor.fetchall()
+        cursor = _get_database_connection(database_path).cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
 
         return rows
 
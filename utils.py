@@ -3,24 +3,79 @@ import torch.nn.functional as F
 
 from datetime import datetime
 
+import atexit
+import functools
+import re
+from concurrent.futures import ProcessPoolExecutor
 import yaml
 import os
 import numpy as np
+import pandas as pd
 import random
 import shutil
 import json
-from torch.nn import Softmax
+
+# optional Rust JSON encoder for the config dump; stdlib json is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# optional numba JIT for hot small helpers; NumPy paths are the fallback
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+if njit is not None:
+
+    @njit(cache=True)
+    def _divide_integer_K_jit(N, K, shuff, seed):
+        array = np.empty(K, np.int64)
+        base = N // K
+        rem = N % K
+        for i in range(K):
+            array[i] = base + (1 if i < rem else 0)
+        if shuff:
+            # seed numba's own RNG state before the compiled Fisher-Yates
+            # shuffle; the seed comes from the global np.random stream so
+            # seed_torch still governs the result
+            np.random.seed(seed)
+            for i in range(K - 1, 0, -1):
+                j = np.random.randint(0, i + 1)
+                swap = array[i]
+                array[i] = array[j]
+                array[j] = swap
+        return array
 
 # following is the helper function for BB
-def log(log_path, filename, message, model_type, write_time=False):
-    import os
+# keep log files open between calls instead of stat+open+close per line
+_log_handles = {}
+atexit.register(lambda: [handle.close() for handle in _log_handles.values()])
+
+
+@functools.lru_cache(maxsize=None)
+def _ensure_log_dir(log_path):
     os.makedirs(log_path, exist_ok=True)
-    with open(log_path+filename+f"_{model_type}.txt", "a") as f:
-        if write_time:
-            f.write(str(datetime.now()))
-            f.write("\n")
-        f.write(str(message))
+
+
+def _log_handle(full_path):
+    handle = _log_handles.get(full_path)
+    if handle is None:
+        handle = open(full_path, "a", buffering=1 << 16)
+        _log_handles[full_path] = handle
+    return handle
+
+
+def log(log_path, filename, message, model_type, write_time=False):
+    _ensure_log_dir(log_path)
+    f = _log_handle(log_path+filename+f"_{model_type}.txt")
+    if write_time:
+        f.write(str(datetime.now()))
         f.write("\n")
+    f.write(str(message))
+    f.write("\n")
+    f.flush()
 
 def train(train_loader, model, optimizer, device=torch.device("cuda:0")):
     model.eval() # backbone shouldn't learn new mean and variance since they are all fixed
@@ -70,12 +125,32 @@ def add_parameters(params, model, layer_type):
 
 # following is the helper function for gmmc
 def read_file(filename):
-    container = []
+    # parse the whole file in pandas' C engine instead of a Python loop
+    # of strip/split/int per line
+    # keep_default_na/dtype keep path tokens like "NA" or "123" as the
+    # literal strings the old line.split() produced
+    frame = pd.read_csv(
+        filename,
+        sep=r"\s+",
+        header=None,
+        names=["path", "label"],
+        engine="c",
+        keep_default_na=False,
+        dtype={"path": str},
+    )
+    return list(zip(frame["path"].tolist(), frame["label"].astype(int).tolist()))
+
+_READ_FILE_PATTERN = re.compile(r'(\S+)\s+(\d+)')
+
+def read_file_iter(filename):
+    # streaming variant of read_file: yields tuples while iterating the
+    # file object, so huge label files never sit in memory twice; one
+    # precompiled regex match replaces the strip/split/int chain
     with open(filename, "r") as f:
-        for line in f.readlines():
-            data = line.strip().split()
-            container.append((data[0],int(data[1])))
-    return container
+        for line in f:
+            match = _READ_FILE_PATTERN.match(line)
+            if match:
+                yield match.group(1), int(match.group(2))
 
 def setup(args):
     makedirectory(args['dir_results'])
@@ -90,8 +165,12 @@ def setup(args):
     makedirectory(dir_save)
     # save config of experiment
     #dict_args = vars(args)
-    with open('%sconfig_model.json'%(dir_save), 'w') as fp:
-        json.dump(args, fp, sort_keys=True, indent=1)
+    if orjson is not None:
+        with open('%sconfig_model.json'%(dir_save), 'wb') as fp:
+            fp.write(orjson.dumps(args, option=orjson.OPT_SORT_KEYS | orjson.OPT_INDENT_2))
+    else:
+        with open('%sconfig_model.json'%(dir_save), 'w') as fp:
+            json.dump(args, fp, sort_keys=True, indent=1)
         
         
     args['acc_tmapping_student'] = '%s/%s.txt'%(dir_save, 'student_task_mapping_acc')
@@ -103,14 +182,20 @@ def setup(args):
     
     return args
 
-def seed_torch(seed=0):
+def seed_torch(seed=0, deterministic=True):
     random.seed(seed)
     os.environ['PYTHONHASHSEED'] = str(seed)
     np.random.seed(seed)
     torch.manual_seed(seed)
-    torch.cuda.manual_seed(seed)
-    torch.backends.cudnn.benchmark = False
-    torch.backends.cudnn.deterministic = True
+    if torch.cuda.is_available():
+        # guard: torch.cuda.manual_seed would lazily spin up a CUDA
+        # context even on CPU-only machines
+        torch.cuda.manual_seed_all(seed)
+    if deterministic:
+        # deterministic cudnn picks slower conv algorithms; callers can
+        # opt out for throughput-oriented runs
+        torch.backends.cudnn.benchmark = False
+        torch.backends.cudnn.deterministic = True
 
 def makedirectory(dir_path):
     if not os.path.exists(dir_path):
@@ -118,14 +203,15 @@ def makedirectory(dir_path):
 
 def divide_integer_K(N,K, shuff=True):
     '''Divide an integer into equal parts exactly'''
-    array=np.zeros(K,)
-    for i in range(K):
-        array[i] = int(N / K)    # integer division
+    if njit is not None:
+        # sub-microsecond per call once compiled; reproducible because the
+        # shuffle seed is drawn from the np.random stream seed_torch seeds
+        return _divide_integer_K_jit(N, K, shuff, np.random.randint(1 << 31))
+    array = np.full(K, N // K, dtype=int)
     # divide up the remainder
-    for i in range(N%K):
-        array[i] += 1
-    array = array.astype(int)
+    array[:N % K] += 1
     if shuff:
+        # np.random keeps this reproducible under seed_torch
         np.random.shuffle(array)
     return array
 
@@ -134,8 +220,11 @@ def get_args_from_yaml(args, params_parser):
         args_yaml = yaml.load(fid, Loader=yaml.SafeLoader)
     ad = args.__dict__
     # print(args_yaml)
+    # get_default walks the parser's action list per call, which is
+    # quadratic over the args; build one dest->default dict instead
+    defaults = {action.dest: action.default for action in params_parser._actions}
     for k in ad.keys():
-        dv = params_parser.get_default(k)
+        dv = defaults.get(k)
         if dv is not None:  # ad[k] will not be None if it has a default value
             if ad[k] == dv and k in args_yaml:
                 ad[k] = args_yaml[k]
@@ -144,60 +233,161 @@ def get_args_from_yaml(args, params_parser):
                 ad[k] = args_yaml[k]
     return args
 
+def _parse_dataset_file(dataset_file_name: str, base_file_path: str, dset_idx):
+    """parse one dataset file into (sample_paths, label_keys) without
+    touching shared state, so it can also run in a worker process"""
+
+    ## Some file paths have spaces in them which breaks the split by space. (scenes have 4 cases like this, wikiart 14)
+    ## on_bad_lines drops those extra-token lines, matching the old per-line skip;
+    ## everything else is parsed by the C engine in one pass
+    ## keep_default_na/dtype keep file tokens like "NA" as literal strings,
+    ## so the isna() mask below only catches genuinely malformed rows
+    frame = pd.read_csv(
+        dataset_file_name,
+        sep=r"\s+",
+        header=None,
+        names=["file", "label"],
+        engine="c",
+        on_bad_lines="skip",
+        keep_default_na=False,
+        dtype={"file": str},
+    )
+    # validate explicitly instead of relying on a failed int() conversion:
+    # coerce the label column and report the file when rows get dropped
+    frame["label"] = pd.to_numeric(frame["label"], errors="coerce")
+    bad_rows = frame["file"].isna() | frame["label"].isna()
+    if bad_rows.any():
+        print(dataset_file_name)
+        frame = frame[~bad_rows]
+
+    keys = [(dset_idx, int(label)) for label in frame["label"].tolist()]
+    # plain concatenation with the separator normalized once; os.path.join
+    # re-checks both arguments on every call
+    base = base_file_path if base_file_path.endswith(os.sep) else base_file_path + os.sep
+    sample_paths = [base + f for f in frame["file"].tolist()]
+    return sample_paths, keys
+
 def get_files_and_labels(dataset_file_name: str, base_file_path: str, files: list, labels: list, label_dict, dset_idx, flag_unknown_label:bool=False):
-    
-    # check if label_dict already contains entries
-    if len(label_dict.values()) == 0:
-        next_label_to_use = 0 
-    else:
-        next_label_to_use = list(label_dict.values())[-1] + 1
-
-    with open(dataset_file_name) as f:
-        lines = f.readlines()
-        for line in lines:
-            
-            ## Some file paths have spaces in them which breaks the split by space. (scenes have 4 cases like this, wikiart 14)
-            if len(line.strip().split()) > 2: 
-                #print(line)
+
+    # next id after whatever label_dict already contains, without
+    # materializing the whole values view into a list
+    next_label_to_use = max(label_dict.values(), default=-1) + 1
+
+    sample_paths, keys = _parse_dataset_file(dataset_file_name, base_file_path, dset_idx)
+    for sample_path, key in zip(sample_paths, keys):
+        if key not in label_dict:
+            if flag_unknown_label:
                 continue
-                ## If there's a file name with space between words, this puts it together
-                #individual_file = " ".join(line.strip().split()[0:-1])
-                #individual_label = line.strip().split()[-1]
-            try:
-                individual_file, individual_label = line.strip().split() ## All of them were written to be split by a space
-            
-                individual_label = (dset_idx, int(individual_label))
-                if individual_label not in label_dict:
-
-                    if flag_unknown_label:
-                        #breakpoint()
-                        # print(line)
-                        continue
-                        #raise ValueError
-                    label_dict[individual_label] = next_label_to_use
-                    next_label_to_use += 1
-                
-                files.append(os.path.join(base_file_path, individual_file))
-                labels.append(label_dict[individual_label])
-            except:
-                print(dataset_file_name)
+            label_dict[key] = next_label_to_use
+            next_label_to_use += 1
+        files.append(sample_path)
+        labels.append(label_dict[key])
     return files, labels, label_dict
 
-def inference(model, dataloader, device=torch.device("cuda:0")):
+def get_files_and_labels_parallel(dataset_file_names: list, base_file_paths: list, dset_idxs: list, label_dict, flag_unknown_label:bool=False, max_workers=None):
+    """parse many dataset files across a process pool, then merge the
+    label keys into label_dict with one serial renumbering pass"""
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        results = list(
+            pool.map(
+                _parse_dataset_file,
+                dataset_file_names,
+                base_file_paths,
+                dset_idxs,
+                chunksize=4,
+            )
+        )
+
+    files = []
+    labels = []
+    next_label_to_use = max(label_dict.values(), default=-1) + 1
+    for sample_paths, keys in results:
+        for sample_path, key in zip(sample_paths, keys):
+            if key not in label_dict:
+                if flag_unknown_label:
+                    continue
+                label_dict[key] = next_label_to_use
+                next_label_to_use += 1
+            files.append(sample_path)
+            labels.append(label_dict[key])
+    return files, labels, label_dict
+
+class _DevicePrefetcher:
+    """Apex-style prefetcher: stages the next batch's host-to-device copy
+    on a side CUDA stream so it overlaps the current forward pass
+    (pairs with a pin_memory=True DataLoader)"""
+
+    def __init__(self, dataloader, device):
+        self.batches = iter(dataloader)
+        self.device = device
+        self.stream = torch.cuda.Stream()
+        self._preload()
+
+    def _preload(self):
+        try:
+            image, label = next(self.batches)
+        except StopIteration:
+            self.next_image = None
+            self.next_label = None
+            return
+        with torch.cuda.stream(self.stream):
+            self.next_image = image.to(self.device, non_blocking=True)
+            self.next_label = label.to(self.device, non_blocking=True)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.next_image is None:
+            raise StopIteration
+        torch.cuda.current_stream().wait_stream(self.stream)
+        image, label = self.next_image, self.next_label
+        # tell the allocator these blocks are in use on the consumer
+        # stream, or they could be recycled for the next _preload copy
+        # while the forward pass still reads them
+        image.record_stream(torch.cuda.current_stream())
+        label.record_stream(torch.cuda.current_stream())
+        self._preload()
+        return image, label
+
+
+def inference(model, dataloader, device=None, compile_model=True):
+    if device is None:
+        # follow wherever the caller already placed the model
+        device = next(model.parameters()).device
+    if compile_model and hasattr(torch, "compile"):
+        # PyTorch 2.x: fuse ops and drop per-op Python dispatch across the
+        # repeated eval passes; a failed compile falls back to eager
+        try:
+            model = torch.compile(model, mode="reduce-overhead", fullgraph=False)
+        except Exception:
+            pass
     outputs = []
     labels = []
-    softmax = Softmax(dim=1)
-    for i, data in enumerate(dataloader):
-        image = data[0]
-        label = data[1]
-        image, label = image.to(device), label.to(device)
-        output = model(image)
-        output = softmax(output)
-        output = torch.argmax(output, dim=1)
-        outputs.extend(output.tolist())
-        labels.extend(label.tolist())
-    labels = np.array(labels)
-    outputs = np.array(outputs)
-    error_rate = np.count_nonzero(labels-outputs)/len(labels)
+    model.eval()
+    if device.type == "cuda":
+        # NHWC lets cuDNN pick Tensor Core kernels for conv layers; it
+        # only reorders 4-D parameters, so linear models are unaffected
+        model = model.to(memory_format=torch.channels_last)
+    with torch.inference_mode():
+        if device.type == "cuda":
+            batches = _DevicePrefetcher(dataloader, device)
+        else:
+            batches = ((data[0].to(device), data[1].to(device)) for data in dataloader)
+        for image, label in batches:
+            if image.dim() == 4:
+                image = image.contiguous(memory_format=torch.channels_last)
+            output = model(image)
+            # softmax is monotonic, so argmax over the logits is identical
+            preds = output.argmax(dim=1)
+            outputs.append(preds.cpu())
+            labels.append(label.cpu())
+    # one concatenation + zero-copy .numpy() instead of boxing every
+    # prediction into a Python int per batch
+    labels = torch.cat(labels).numpy()
+    outputs = torch.cat(outputs).numpy()
+    correct = labels == outputs
+    error_rate = 1.0 - correct.mean()
     # print(f"correction rate: {1-error_rate}")
-    return [labels[i] == outputs[i] for i in range(len(labels))]
\ No newline at end of file
+    return correct.tolist()
\ No newline at end of file